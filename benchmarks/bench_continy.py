@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for ConTiny core operations
+
+Generates synthetic workloads (configs, source trees and containers) in a
+scratch directory, times the core operations and writes the results as
+JSON so runs from different commits can be compared.
+"""
+
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+
+# Allow running from a source checkout without installing the package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from continy.builder import ContainerBuilder  # noqa: E402
+from continy.config import ConfigParser  # noqa: E402
+from continy.core import ConTiny  # noqa: E402
+from continy.lock import (  # noqa: E402
+    PIP_PACKAGES,
+    ArtifactCache,
+    LockFile,
+    apt_packages,
+    host_arch,
+)
+from continy.utils import copy_file_safe, get_directory_size  # noqa: E402
+
+SCHEMA_VERSION = 2
+
+# Workload sizes: packages/files per config, files per source tree, containers
+PROFILES = {
+    "quick": {"packages": 50, "files": 50, "tree_files": 200, "containers": 20},
+    "default": {"packages": 500, "files": 500, "tree_files": 1000, "containers": 100},
+    "large": {
+        "packages": 5000,
+        "files": 5000,
+        "tree_files": 10000,
+        "containers": 1000,
+    },
+}
+
+# Source tree file sizes in bytes, picked at random per file
+FILE_SIZES = [0, 128, 1024, 16 * 1024, 256 * 1024]
+
+# Minimum duration of a timing sample, excluding setup
+MIN_SAMPLE_TIME = 0.01
+
+
+@contextmanager
+def quiet():
+    """Silence stdout and stderr, including output of child processes"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        with redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [devnull]:
+            os.close(fd)
+
+
+@contextmanager
+def environment(**variables: str):
+    """Temporarily set environment variables"""
+    previous = {key: os.environ.get(key) for key in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+@contextmanager
+def working_directory(path: Path):
+    """Temporarily change the current working directory"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def make_source_tree(root: Path, count: int, seed: int = 0) -> List[Path]:
+    """Create a source tree of files with varying sizes"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = root / f"pkg{i % 16}" / f"mod{i % 7}" / f"file{i}.dat"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(rng.choice(FILE_SIZES)))
+        paths.append(path)
+    return paths
+
+
+def make_config(name: str, packages: int, files: List[Path]) -> Dict[str, Any]:
+    """Create a container configuration dictionary"""
+    return {
+        "name": name,
+        "base_distro": "ubuntu:20.04",
+        "python_version": "3.9",
+        "packages": [f"package-{i}" for i in range(packages)],
+        "files": {str(path): f"/workspace/src/{path.name}" for path in files},
+        "environment": {"PYTHONPATH": "/workspace", "BENCH": "1"},
+        "working_dir": "/workspace",
+        "entrypoint": ["/bin/bash"],
+    }
+
+
+def write_conf_file(path: Path, config: Dict[str, Any]):
+    """Write a configuration in ConTiny .conf format"""
+    lines = [
+        f"NAME: {config['name']}",
+        f"BASE: {config['base_distro']}",
+        f"PYTHON: {config['python_version']}",
+    ]
+    lines += [f"PACKAGE: {package}" for package in config["packages"]]
+    lines += [f"FILE: {src}:{dst}" for src, dst in config["files"].items()]
+    lines += [f"ENV: {key}:{value}" for key, value in config["environment"].items()]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def make_lock(config: Dict[str, Any], cache: ArtifactCache) -> LockFile:
+    """Create a lock with synthetic artifacts so builds need no network"""
+    staging = cache.staging_dir()
+    lock = LockFile(base_distro=config["base_distro"], arch=host_arch())
+    requested = apt_packages(config)
+    packages = {}
+    for package in requested:
+        deb = staging / f"{package}_1.0_amd64.deb"
+        deb.write_bytes(package.encode())
+        packages[package] = {
+            "version": "1.0",
+            "filename": deb.name,
+            "sha256": cache.add(deb),
+        }
+    lock.apt = {"requested": requested, "packages": packages}
+    artifacts = []
+    for requirement in PIP_PACKAGES:
+        wheel = staging / f"{requirement}-1.0-py3-none-any.whl"
+        wheel.write_bytes(requirement.encode())
+        artifacts.append(
+            {
+                "name": requirement,
+                "version": "1.0",
+                "filename": wheel.name,
+                "sha256": cache.add(wheel),
+            }
+        )
+    lock.pip = {
+        "requirements": PIP_PACKAGES,
+        "python_version": config["python_version"],
+        "artifacts": artifacts,
+    }
+    shutil.rmtree(staging, ignore_errors=True)
+    return lock
+
+
+def time_call(
+    func: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> List[float]:
+    """Time func repeat times, running setup untimed before each call
+
+    Cheap calls are repeated until a sample takes at least MIN_SAMPLE_TIME
+    and the per-call average is recorded, so that timer resolution and
+    scheduling noise do not dominate short calls.
+    """
+
+    def sample(number: int) -> float:
+        elapsed = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    number = 1
+    with quiet():
+        while sample(number) < MIN_SAMPLE_TIME:
+            number *= 2
+        return [sample(number) / number for _ in range(repeat)]
+
+
+def summarize(timings: List[float], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Summarize timings in seconds"""
+    return {
+        "params": params,
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "max": max(timings),
+    }
+
+
+def run_benchmarks(
+    sizes: Dict[str, int], repeat: int, workdir: Path
+) -> Dict[str, Dict[str, Any]]:
+    """Run all benchmarks inside workdir and return results by name
+
+    The artifact cache is kept inside workdir as well, so that synthetic
+    artifacts never end up in the cache configured by $CONTINY_CACHE.
+    """
+    with environment(CONTINY_CACHE=str(workdir / "cache")):
+        return _run_benchmarks(sizes, repeat, workdir)
+
+
+def _run_benchmarks(
+    sizes: Dict[str, int], repeat: int, workdir: Path
+) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    src_root = workdir / "src"
+    tree = make_source_tree(src_root, sizes["tree_files"])
+    config = make_config("bench", sizes["packages"], tree[: sizes["files"]])
+    config_params = {"packages": sizes["packages"], "files": sizes["files"]}
+
+    json_path = workdir / "bench.json"
+    json_path.write_text(json.dumps(config, indent=2))
+    conf_path = workdir / "bench.conf"
+    write_conf_file(conf_path, config)
+
+    results["config.load_json"] = summarize(
+        time_call(lambda: ConfigParser.load_config_file(str(json_path)), repeat),
+        config_params,
+    )
+    results["config.load_conf"] = summarize(
+        time_call(lambda: ConfigParser.load_config_file(str(conf_path)), repeat),
+        config_params,
+    )
+    results["builder.from_file_json"] = summarize(
+        time_call(lambda: ContainerBuilder.from_file(str(json_path)), repeat),
+        config_params,
+    )
+    results["builder.from_file_conf"] = summarize(
+        time_call(lambda: ContainerBuilder.from_file(str(conf_path)), repeat),
+        config_params,
+    )
+
+    with working_directory(workdir):
+        container = ContainerBuilder.from_file(str(json_path))
+
+        def reset_container():
+            shutil.rmtree(container.base_dir, ignore_errors=True)
+
+        results["core.create"] = summarize(
+            time_call(container.create, repeat, setup=reset_container),
+            config_params,
+        )
+        with quiet():
+            container.create()
+        make_lock(container.config, ArtifactCache()).save(container.lock_file)
+        results["core.build"] = summarize(
+            time_call(
+                lambda: container.build(offline=True), repeat, setup=container.create
+            ),
+            config_params,
+        )
+        results["core.run"] = summarize(
+            time_call(lambda: container.run(["true"]), repeat),
+            config_params,
+        )
+
+        shutil.rmtree("containers", ignore_errors=True)
+        with quiet():
+            for i in range(sizes["containers"]):
+                ConTiny(f"bench-{i}").create()
+        results["core.list_containers"] = summarize(
+            time_call(ConTiny.list_containers, repeat),
+            {"containers": sizes["containers"]},
+        )
+
+    tree_params = {"tree_files": sizes["tree_files"]}
+    copy_dest = workdir / "copy"
+
+    def reset_copy():
+        shutil.rmtree(copy_dest, ignore_errors=True)
+
+    results["utils.copy_file_safe_tree"] = summarize(
+        time_call(
+            lambda: copy_file_safe(str(src_root), copy_dest), repeat, setup=reset_copy
+        ),
+        tree_params,
+    )
+    results["utils.copy_file_safe_file"] = summarize(
+        time_call(
+            lambda: copy_file_safe(str(tree[-1]), copy_dest / "single.dat"),
+            repeat,
+            setup=reset_copy,
+        ),
+        {"size": tree[-1].stat().st_size},
+    )
+    results["utils.get_directory_size"] = summarize(
+        time_call(lambda: get_directory_size(src_root), repeat),
+        tree_params,
+    )
+
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """Return the current git commit, if available"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=str(Path(__file__).resolve().parent),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float,
+    min_delta: float = 0.0,
+) -> Tuple[List[str], List[str], int]:
+    """Compare results against a baseline
+
+    Returns a description of each benchmark slower than baseline by
+    threshold, a description of each benchmark that could not be compared
+    and the number of benchmarks compared. The fastest run is compared
+    since it is the least affected by noise. Slowdowns of less than
+    min_delta seconds are ignored, since short calls that touch the
+    filesystem vary by more than threshold between runs.
+    """
+    regressions = []
+    skipped = []
+    compared = 0
+    baseline_results = baseline.get("results", {})
+    for name, result in current["results"].items():
+        previous = baseline_results.get(name)
+        if previous is None:
+            skipped.append(f"{name}: not in baseline")
+            continue
+        if previous["params"] != result["params"]:
+            skipped.append(
+                f"{name}: parameters changed "
+                f"({previous['params']} -> {result['params']})"
+            )
+            continue
+        if previous["min"] <= 0:
+            skipped.append(f"{name}: baseline time is zero")
+            continue
+        compared += 1
+        ratio = result["min"] / previous["min"]
+        if ratio > 1 + threshold and result["min"] - previous["min"] > min_delta:
+            regressions.append(
+                f"{name}: {previous['min'] * 1000:.3f} ms -> "
+                f"{result['min'] * 1000:.3f} ms ({ratio:.2f}x)"
+            )
+    for name in baseline_results:
+        if name not in current["results"]:
+            skipped.append(f"{name}: not in current results")
+    return regressions, skipped, compared
+
+
+@click.command()
+@click.option(
+    "--profile",
+    type=click.Choice(sorted(PROFILES)),
+    default="default",
+    show_default=True,
+    help="Workload size",
+)
+@click.option("--repeat", "-r", default=5, show_default=True, help="Runs per benchmark")
+@click.option("--output", "-o", type=click.Path(), help="Write JSON results to file")
+@click.option(
+    "--compare",
+    "-c",
+    type=click.Path(exists=True),
+    help="Baseline JSON results to compare against",
+)
+@click.option(
+    "--threshold",
+    default=0.25,
+    show_default=True,
+    help="Allowed slowdown relative to baseline (0.25 = 25%)",
+)
+@click.option(
+    "--min-delta",
+    default=2.0,
+    show_default=True,
+    help="Ignore slowdowns smaller than this many milliseconds",
+)
+def main(profile, repeat, output, compare, threshold, min_delta):
+    """Benchmark ConTiny core operations"""
+    sizes = PROFILES[profile]
+    workdir = Path(tempfile.mkdtemp(prefix="continy-bench-"))
+    try:
+        results = run_benchmarks(sizes, repeat, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "profile": profile,
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+    for name, result in results.items():
+        click.echo(
+            f"{name:32} median {result['median'] * 1000:10.3f} ms  "
+            f"min {result['min'] * 1000:10.3f} ms"
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"Results written to {output}")
+
+    if compare:
+        with open(compare, "r") as f:
+            baseline = json.load(f)
+
+        for key in ["schema", "profile"]:
+            if baseline.get(key) != report[key]:
+                click.echo(
+                    f"Baseline {key} {baseline.get(key)!r} does not match "
+                    f"{report[key]!r}, results are not comparable",
+                    err=True,
+                )
+                sys.exit(1)
+
+        regressions, skipped, compared = compare_results(
+            baseline, report, threshold, min_delta / 1000
+        )
+        if skipped:
+            click.echo("Not compared:", err=True)
+            for reason in skipped:
+                click.echo(f"  - {reason}", err=True)
+        if compared == 0:
+            click.echo("No benchmarks could be compared with the baseline.", err=True)
+            sys.exit(1)
+        if regressions:
+            click.echo("Performance regressions:", err=True)
+            for regression in regressions:
+                click.echo(f"  - {regression}", err=True)
+            sys.exit(1)
+        click.echo(f"No performance regressions in {compared} benchmarks.")
+
+
+if __name__ == "__main__":
+    main()
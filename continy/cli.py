@@ -1,6 +1,7 @@
 import click
 from .core import ConTiny
 from .builder import ContainerBuilder
+from .logs import DEFAULT_BACKUPS, DEFAULT_MAX_BYTES, DEFAULT_TAIL_LINES
 
 
 @click.group()
@@ -24,25 +25,68 @@ def create(file, name):
 @cli.command()
 @click.option("--file", "-f", help="Container configuration file")
 @click.option("--name", "-n", help="Container name")
-def build(file, name):
+@click.option(
+    "--offline", is_flag=True, help="Build only from the lock file and local cache"
+)
+def build(file, name, offline):
     """Build a container"""
     if file:
         container = ContainerBuilder.from_file(file)
     else:
         container = ConTiny(name)
         container.load_config()
-    container.build()
+    try:
+        container.build(offline=offline)
+    except (RuntimeError, ValueError) as e:
+        raise click.ClickException(str(e))
 
 
 @cli.command()
 @click.option("--name", "-n", required=True, help="Container name")
 @click.option("--command", "-c", help="Command to run")
-def run(name, command):
+@click.option(
+    "--detach", "-d", is_flag=True, help="Run in background and capture output to logs"
+)
+@click.option(
+    "--log-max-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_BYTES,
+    show_default=True,
+    help="Maximum size of a log file in bytes before it is rotated",
+)
+@click.option(
+    "--log-backups",
+    type=click.IntRange(min=0),
+    default=DEFAULT_BACKUPS,
+    show_default=True,
+    help="Number of rotated log files to keep",
+)
+def run(name, command, detach, log_max_size, log_backups):
     """Run a container"""
     container = ConTiny(name)
     container.load_config()
     cmd = command.split() if command else None
-    container.run(cmd)
+    container.run(cmd, detach=detach, max_bytes=log_max_size, backups=log_backups)
+
+
+@cli.command()
+@click.argument("name")
+@click.option("--follow", "-f", is_flag=True, help="Follow log output")
+@click.option(
+    "--tail",
+    "-n",
+    type=click.IntRange(min=0),
+    default=DEFAULT_TAIL_LINES,
+    show_default=True,
+    help="Number of lines to show from the end",
+)
+@click.option(
+    "--all", "show_all", is_flag=True, help="Show the whole log including backups"
+)
+def logs(name, follow, tail, show_all):
+    """Show logs of a detached container"""
+    container = ConTiny(name)
+    container.logs(tail=None if show_all else tail, follow_output=follow)
 
 
 @cli.command()
@@ -14,6 +14,24 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 from .config import ContainerConfig, ConfigParser
+from .lock import (
+    LOCK_FILE_NAME,
+    PIP_PACKAGES,
+    ArtifactCache,
+    LockFile,
+    base_apt_packages,
+    lock_dependencies,
+)
+from .logs import (
+    DEFAULT_BACKUPS,
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TAIL_LINES,
+    follow,
+    is_running,
+    log_position,
+    read_all,
+    read_tail,
+)
 from .utils import (
     run_command,
     create_directory_structure,
@@ -21,6 +39,12 @@ from .utils import (
     print_container_info,
 )
 
+# Starts continy.supervisor from this package even when it is not installed
+SUPERVISOR_BOOTSTRAP = (
+    "import sys; sys.path.insert(0, sys.argv.pop(1)); "
+    "from continy.supervisor import main; sys.exit(main())"
+)
+
 
 class ConTiny:
     def __init__(self, name: str):
@@ -28,6 +52,10 @@ class ConTiny:
         self.base_dir = Path(f"containers/{name}")
         self.rootfs_dir = self.base_dir / "rootfs"
         self.config_file = self.base_dir / "container.json"
+        self.lock_file = self.base_dir / LOCK_FILE_NAME
+        self.logs_dir = self.base_dir / "logs"
+        self.log_file = self.logs_dir / "container.log"
+        self.pid_file = self.logs_dir / "container.pid"
         self.config = {
             "name": name,
             "base_distro": "ubuntu:20.04",
@@ -93,43 +121,94 @@ class ConTiny:
             with open(self.config_file, "r") as f:
                 self.config = json.load(f)
 
-    def build(self):
-        """Build the container"""
+    def build(self, offline: bool = False):
+        """Build the container
+
+        Dependencies are resolved to exact versions and recorded in the lock
+        file next to the configuration. Locked artifacts already in the cache
+        are reused; with offline=True nothing is resolved and the build uses
+        the cache only.
+        """
         print(f"Building container: {self.name}")
 
+        # Resolve dependencies and update the lock file
+        lock = self._lock_dependencies(offline)
+
         # Create bootstrap script
-        bootstrap_script = self._create_bootstrap_script()
+        bootstrap_script = self._create_bootstrap_script(lock)
 
         # Run bootstrap in chroot environment
         self._run_bootstrap(bootstrap_script)
 
+        # Make locked artifacts available inside the container
+        self._stage_artifacts(lock)
+
         # Copy user files
-        self._copy_user_files()
+        self._copy_user_files(lock)
 
         # Setup Python virtual environment
         self._setup_python_env()
 
         print(f"Container {self.name} built successfully!")
 
-    def _create_bootstrap_script(self) -> str:
-        """Create bootstrap script for container setup"""
-        script = f"""#!/bin/bash
+    def _lock_dependencies(self, offline: bool = False) -> LockFile:
+        """Resolve dependencies against the lock file and artifact cache"""
+        try:
+            previous = LockFile.load(self.lock_file)
+        except ValueError as e:
+            if offline:
+                raise RuntimeError(f"Cannot build offline from {self.lock_file}: {e}")
+            print(f"Warning: Ignoring {self.lock_file}: {e}; resolving again")
+            previous = None
+        if offline and previous is None:
+            raise RuntimeError(f"Offline build requires a lock file: {self.lock_file}")
+
+        lock = lock_dependencies(self.config, previous, ArtifactCache(), offline)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        lock.save(self.lock_file)
+        return lock
+
+    def _create_bootstrap_script(self, lock: Optional[LockFile] = None) -> str:
+        """Create bootstrap script for container setup
+
+        When the lock holds the apt dependency closure, all packages are
+        installed from artifacts staged under /var/cache/continy and no
+        package lists are fetched, so a locked build needs no network access.
+        """
+        lock = lock or LockFile()
+        script = """#!/bin/bash
 set -e
 
-# Update package manager
+"""
+        if lock.apt:
+            debs = " ".join(
+                f"/var/cache/continy/apt/{entry['filename']}"
+                for entry in lock.apt["packages"].values()
+            )
+            script += f"""# Install locked packages and their dependencies
+apt-get install -y --no-download {debs}
+"""
+        else:
+            script += f"""# Update package manager
 apt-get update
 
 # Install basic packages
-apt-get install -y python{self.config['python_version']} python3-pip python3-venv curl wget
+apt-get install -y {' '.join(base_apt_packages(self.config))}
 
 # Install additional packages
 """
-        for package in self.config["packages"]:
-            script += f"apt-get install -y {package}\n"
+            for package in self.config["packages"]:
+                script += f"apt-get install -y {package}\n"
+
+        # Wheels are locked for the configured Python, not the distro's python3
+        pip_command = f"python{self.config['python_version']} -m pip install "
+        if lock.pip:
+            pip_command += "--no-index --find-links /var/cache/continy/pip "
+        pip_command += " ".join(PIP_PACKAGES)
 
-        script += """
+        script += f"""
 # Install Jupyter
-pip3 install jupyter notebook jupyterlab
+{pip_command}
 
 # Clean up
 apt-get clean
@@ -149,14 +228,39 @@ rm -rf /var/lib/apt/lists/*
         # In a real implementation, you'd use chroot or namespaces
         print("Setting up container environment...")
 
-    def _copy_user_files(self):
-        """Copy user-specified files into container"""
+    def _stage_artifacts(self, lock: LockFile):
+        """Copy locked apt and pip artifacts from the cache into the container"""
+        cache = ArtifactCache()
+        staged = [("apt", entry) for entry in lock.apt.get("packages", {}).values()]
+        staged += [("pip", entry) for entry in lock.pip.get("artifacts", [])]
+        for kind, entry in staged:
+            dest_path = self.rootfs_dir / "var/cache/continy" / kind / entry["filename"]
+            if not dest_path.exists():
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(cache.path(entry["sha256"], entry["filename"]), dest_path)
+
+    def _copy_user_files(self, lock: Optional[LockFile] = None):
+        """Copy user-specified files into container
+
+        Files missing at their source are restored from the artifact cache
+        when the lock file records them.
+        """
+        lock = lock or LockFile()
+        cache = ArtifactCache()
         for source, destination in self.config["files"].items():
+            entry = lock.files.get(source)
             if os.path.exists(source):
-                dest_path = self.rootfs_dir / destination.lstrip("/")
-                dest_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(source, dest_path)
-                print(f"Copied {source} -> {destination}")
+                copy_from = source
+            elif entry and cache.get(entry["sha256"], os.path.basename(source)):
+                copy_from = cache.path(entry["sha256"], os.path.basename(source))
+            else:
+                print(f"Warning: Source file not found: {source}")
+                continue
+
+            dest_path = self.rootfs_dir / destination.lstrip("/")
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(copy_from, dest_path)
+            print(f"Copied {source} -> {destination}")
 
     def _setup_python_env(self):
         """Setup Python virtual environment"""
@@ -184,8 +288,23 @@ exec "$@"
             f.write(startup_script)
         os.chmod(startup_path, 0o755)
 
-    def run(self, command: Optional[List[str]] = None):
-        """Run container with specified command"""
+    def run(
+        self,
+        command: Optional[List[str]] = None,
+        detach: bool = False,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+    ):
+        """Run container with specified command
+
+        With detach=True the command runs in the background and its output
+        is written to size-capped, rotating log files in the logs directory.
+        """
+        if detach and max_bytes <= 0:
+            raise ValueError("Log file size must be positive")
+        if detach and backups < 0:
+            raise ValueError("Number of log backups must not be negative")
+
         if not self.rootfs_dir.exists():
             print(f"Container {self.name} not built. Run build() first.")
             return
@@ -200,15 +319,86 @@ exec "$@"
         env = os.environ.copy()
         env.update(self.config["environment"])
 
-        try:
-            subprocess.run(
-                ["/bin/bash", str(self.rootfs_dir / "entrypoint.sh")] + command,
-                cwd=str(self.rootfs_dir / "workspace"),
+        container_command = [
+            "/bin/bash",
+            str((self.rootfs_dir / "entrypoint.sh").resolve()),
+        ] + command
+        workspace = str(self.rootfs_dir / "workspace")
+
+        if detach:
+            if is_running(self.pid_file):
+                print(f"Container {self.name} is already running.")
+                return
+
+            self.logs_dir.mkdir(parents=True, exist_ok=True)
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    SUPERVISOR_BOOTSTRAP,
+                    str(Path(__file__).resolve().parent.parent),
+                    str(self.log_file),
+                    "--max-bytes",
+                    str(max_bytes),
+                    "--backups",
+                    str(backups),
+                    "--cwd",
+                    workspace,
+                    "--pid-file",
+                    str(self.pid_file),
+                    "--",
+                ]
+                + container_command,
                 env=env,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
             )
+            if process.returncode != 0:
+                print(f"Failed to start container {self.name}:")
+                print(process.stderr.strip())
+                return
+
+            pid = int(process.stdout.strip())
+            print(f"Container {self.name} running in background (pid {pid})")
+            print(f"Logs: {self.log_file}")
+            return pid
+
+        try:
+            subprocess.run(container_command, cwd=workspace, env=env)
         except KeyboardInterrupt:
             print("\nContainer stopped.")
 
+    def logs(
+        self,
+        tail: Optional[int] = DEFAULT_TAIL_LINES,
+        follow_output: bool = False,
+    ):
+        """Print container logs from a detached run
+
+        Only the last tail lines are read; pass tail=None to print the
+        whole log including rotated backups.
+        """
+        end = log_position(self.log_file)
+        if end is None:
+            print(f"No logs found for container {self.name}.")
+            return
+
+        output = sys.stdout.buffer
+        sys.stdout.flush()
+        if tail is not None:
+            output.write(read_tail(self.log_file, tail, end))
+        else:
+            for chunk in read_all(self.log_file, end):
+                output.write(chunk)
+        output.flush()
+
+        if follow_output:
+            try:
+                follow(self.log_file, output, self.pid_file, start=end)
+            except KeyboardInterrupt:
+                pass
+
     def list_containers():
         """List all containers"""
         containers_dir = Path("containers")
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+Dependency lockfile and artifact cache for ConTiny
+"""
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+from .utils import run_command
+
+LOCK_FILE_NAME = "continy.lock"
+LOCK_VERSION = 2
+DEFAULT_CACHE_DIR = Path("containers/.cache")
+
+# Upper bound for a single resolve or download command, in seconds,
+# overridden by $CONTINY_RESOLVE_TIMEOUT
+DEFAULT_RESOLVE_TIMEOUT = 300
+# Per-connection timeout passed to apt and pip, in seconds
+NETWORK_TIMEOUT = 15
+
+# Packages installed into every container besides the configured ones
+BASE_APT_PACKAGES = ["python3-pip", "python3-venv", "curl", "wget"]
+PIP_PACKAGES = ["jupyter", "notebook", "jupyterlab"]
+
+OFFLINE_HINT = (
+    "check the network connection, or build with --offline from an "
+    "existing lock file"
+)
+
+
+def describe_failure(error: Exception) -> str:
+    """Describe why a resolve command failed"""
+    if isinstance(error, subprocess.TimeoutExpired):
+        return f"{error.cmd[0]} timed out after {error.timeout}s"
+    if isinstance(error, subprocess.CalledProcessError):
+        return f"{error.cmd[0]} exited with status {error.returncode}"
+    return str(error)
+
+
+def resolve_timeout() -> int:
+    """Return the resolve timeout from $CONTINY_RESOLVE_TIMEOUT"""
+    value = os.environ.get("CONTINY_RESOLVE_TIMEOUT")
+    if value is None:
+        return DEFAULT_RESOLVE_TIMEOUT
+    try:
+        timeout = int(value)
+    except ValueError:
+        timeout = 0
+    if timeout <= 0:
+        raise RuntimeError(
+            "CONTINY_RESOLVE_TIMEOUT must be a positive number of seconds, "
+            f"not {value!r}"
+        )
+    return timeout
+
+
+def sha256_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def base_apt_packages(config: Dict[str, Any]) -> List[str]:
+    """Return the apt packages installed into every container"""
+    return [f"python{config['python_version']}"] + BASE_APT_PACKAGES
+
+
+def apt_packages(config: Dict[str, Any]) -> List[str]:
+    """Return all apt packages installed for a container configuration"""
+    packages = base_apt_packages(config)
+    for package in config["packages"]:
+        if package not in packages:
+            packages.append(package)
+    return packages
+
+
+def host_distro() -> Optional[str]:
+    """Return the host distribution as <id>:<version>, like base_distro"""
+    try:
+        with open("/etc/os-release", "r") as f:
+            release = dict(
+                line.strip().split("=", 1) for line in f if "=" in line.strip()
+            )
+    except OSError:
+        return None
+    distro_id = release.get("ID", "").strip('"')
+    version = release.get("VERSION_ID", "").strip('"')
+    if not distro_id or not version:
+        return None
+    return f"{distro_id}:{version}"
+
+
+def host_arch() -> str:
+    """Return the host package architecture"""
+    try:
+        return run_command(["dpkg", "--print-architecture"]).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return platform.machine()
+
+
+class ArtifactCache:
+    """Content-addressed store of downloaded artifacts
+
+    Artifacts are kept as ``<cache_dir>/<sha256>/<filename>`` so that the
+    original file name, which apt and pip rely on, is preserved.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        if cache_dir is None:
+            cache_dir = Path(os.environ.get("CONTINY_CACHE", DEFAULT_CACHE_DIR))
+        self.cache_dir = Path(cache_dir)
+
+    def path(self, sha256: str, filename: str) -> Path:
+        """Return the location of an artifact in the cache"""
+        return self.cache_dir / sha256 / filename
+
+    def get(self, sha256: str, filename: str) -> Optional[Path]:
+        """Return the cached artifact if present and its hash matches"""
+        path = self.path(sha256, filename)
+        if not path.is_file() or sha256_file(path) != sha256:
+            return None
+        return path
+
+    def add(self, path: Path, copy: bool = False) -> str:
+        """Move or copy a file into the cache and return its hash
+
+        A damaged copy already in the cache is replaced.
+        """
+        sha256 = sha256_file(path)
+        target = self.cache_dir / sha256 / path.name
+        if not self.get(sha256, path.name):
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if copy:
+                shutil.copy2(path, target)
+            else:
+                shutil.move(str(path), str(target))
+        return sha256
+
+    def staging_dir(self) -> Path:
+        """Create a temporary directory for downloads inside the cache"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix=".download-", dir=self.cache_dir))
+
+
+@dataclass
+class LockFile:
+    """Resolved versions and hashes of container dependencies
+
+    ``apt`` holds the requested packages and every package in their
+    dependency closure, ``pip`` the Jupyter requirements and all of their
+    wheels. Both are only valid for the recorded base_distro and arch.
+    """
+
+    base_distro: str = ""
+    arch: str = ""
+    apt: Dict[str, Any] = field(default_factory=dict)
+    pip: Dict[str, Any] = field(default_factory=dict)
+    files: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary"""
+        return {
+            "lock_version": LOCK_VERSION,
+            "base_distro": self.base_distro,
+            "arch": self.arch,
+            "apt": self.apt,
+            "pip": self.pip,
+            "files": self.files,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LockFile":
+        """Create from dictionary"""
+        if data.get("lock_version") != LOCK_VERSION:
+            raise ValueError(
+                f"Unsupported lock file version: {data.get('lock_version')}"
+            )
+        return cls(
+            base_distro=data.get("base_distro", ""),
+            arch=data.get("arch", ""),
+            apt=data.get("apt", {}),
+            pip=data.get("pip", {}),
+            files=data.get("files", {}),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LockFile"]:
+        """Load a lock file, returning None if it does not exist"""
+        if not path.exists():
+            return None
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path: Path):
+        """Save the lock file with a stable key order"""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+def parse_print_uris(output: str) -> Dict[str, Dict[str, str]]:
+    """Parse `apt-get install --print-uris` output into lock entries
+
+    Lines look like ``'<uri>' <name>_<version>_<arch>.deb <size> SHA256:<hash>``.
+    """
+    packages = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) < 4 or not parts[0].startswith("'"):
+            continue
+        filename = parts[1]
+        name, version = filename.split("_")[:2]
+        entry = {"version": unquote(version), "filename": filename}
+        if parts[3].startswith("SHA256:"):
+            entry["sha256"] = parts[3].split(":", 1)[1]
+        packages[name] = entry
+    return packages
+
+
+def print_uris(specs: List[str], timeout: int) -> Dict[str, Dict[str, str]]:
+    """Compute the apt dependency closure of package specs"""
+    result = run_command(
+        [
+            "apt-get",
+            "install",
+            "--print-uris",
+            "-qq",
+            "-o",
+            "Debug::NoLocking=1",
+            "-o",
+            "Dir::State::status=/dev/null",
+        ]
+        + specs,
+        timeout=timeout,
+    )
+    packages = parse_print_uris(result.stdout)
+    if not packages:
+        raise RuntimeError("apt did not report any packages to download")
+    return packages
+
+
+def download_apt_packages(
+    packages: Dict[str, Dict[str, str]], cache: ArtifactCache, timeout: int
+):
+    """Download exact package versions into the cache with a single command
+
+    Each download is checked against the hash in its entry, which is
+    filled in for entries that do not have one yet.
+    """
+    print(f"Downloading {len(packages)} apt packages...")
+    staging = cache.staging_dir()
+    try:
+        run_command(
+            [
+                "apt-get",
+                "download",
+                "-o",
+                "Acquire::Retries=0",
+                "-o",
+                f"Acquire::http::Timeout={NETWORK_TIMEOUT}",
+            ]
+            + [f"{name}={entry['version']}" for name, entry in packages.items()],
+            cwd=str(staging),
+            timeout=timeout,
+        )
+        for name, entry in packages.items():
+            deb = staging / entry["filename"]
+            if not deb.exists():
+                raise RuntimeError(f"Package {name} was not downloaded")
+            sha256 = sha256_file(deb)
+            if entry.setdefault("sha256", sha256) != sha256:
+                raise RuntimeError(f"Hash mismatch for downloaded package {name}")
+            cache.add(deb)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def resolve_apt_packages(
+    requested: List[str],
+    cache: ArtifactCache,
+    timeout: int,
+    locked: Optional[Dict[str, Dict[str, str]]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """Resolve apt packages and their full dependency closure
+
+    The closure is computed against an empty package database, so packages
+    already installed on the host are included. Packages in the closure
+    that are also in locked keep their locked version and hash; only the
+    remaining ones take the versions currently available. Packages missing
+    from the cache are then downloaded and checked against their hashes.
+    """
+    print(f"Resolving {len(requested)} apt packages...")
+    packages = print_uris(requested, timeout)
+    locked = locked or {}
+    pins = {
+        name: locked[name]["version"]
+        for name in packages
+        if name in locked and packages[name]["version"] != locked[name]["version"]
+    }
+    if pins:
+        specs = [name for name in requested if name not in pins]
+        specs += [f"{name}={version}" for name, version in pins.items()]
+        packages = print_uris(specs, timeout)
+
+    for name, entry in packages.items():
+        if name in locked and locked[name]["version"] == entry["version"]:
+            packages[name] = dict(locked[name])
+    missing = {
+        name: entry
+        for name, entry in packages.items()
+        if "sha256" not in entry or not cache.get(entry["sha256"], entry["filename"])
+    }
+    if missing:
+        download_apt_packages(missing, cache, timeout)
+    return packages
+
+
+def pip_download(
+    specs: List[str],
+    python_version: str,
+    dest: Path,
+    timeout: int,
+    extra: Optional[List[str]] = None,
+):
+    """Download wheels for the container's Python version into dest"""
+    run_command(
+        [
+            sys.executable,
+            "-m",
+            "pip",
+            "download",
+            "--quiet",
+            "--retries",
+            "1",
+            "--timeout",
+            str(NETWORK_TIMEOUT),
+            "--dest",
+            str(dest),
+            "--python-version",
+            python_version,
+            "--only-binary=:all:",
+        ]
+        + (extra or [])
+        + specs,
+        timeout=timeout,
+    )
+
+
+def resolve_pip_packages(
+    requirements: List[str], python_version: str, cache: ArtifactCache, timeout: int
+) -> Dict[str, Any]:
+    """Download pip packages and dependencies into the cache
+
+    Wheels are resolved for the container's Python version rather than the
+    host interpreter.
+    """
+    print(f"Resolving Python packages: {' '.join(requirements)}...")
+    staging = cache.staging_dir()
+    try:
+        pip_download(requirements, python_version, staging, timeout)
+        artifacts = []
+        for wheel in sorted(staging.glob("*.whl")):
+            name, version = wheel.name.split("-")[:2]
+            artifacts.append(
+                {
+                    "name": name,
+                    "version": version,
+                    "filename": wheel.name,
+                    "sha256": cache.add(wheel),
+                }
+            )
+        return {
+            "requirements": list(requirements),
+            "python_version": python_version,
+            "artifacts": artifacts,
+        }
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def download_pip_artifacts(
+    artifacts: List[Dict[str, str]],
+    python_version: str,
+    cache: ArtifactCache,
+    timeout: int,
+):
+    """Download exact locked wheels into the cache and check their hashes"""
+    print(f"Downloading {len(artifacts)} locked Python packages...")
+    staging = cache.staging_dir()
+    try:
+        pip_download(
+            [f"{a['name']}=={a['version']}" for a in artifacts],
+            python_version,
+            staging,
+            timeout,
+            extra=["--no-deps"],
+        )
+        for artifact in artifacts:
+            wheel = staging / artifact["filename"]
+            if not wheel.exists():
+                raise RuntimeError(f"Wheel {artifact['filename']} was not downloaded")
+            if sha256_file(wheel) != artifact["sha256"]:
+                raise RuntimeError(
+                    f"Hash mismatch for downloaded wheel {artifact['filename']}"
+                )
+            cache.add(wheel)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def lock_dependencies(
+    config: Dict[str, Any],
+    previous: Optional[LockFile],
+    cache: ArtifactCache,
+    offline: bool = False,
+) -> LockFile:
+    """Resolve container dependencies, keeping locked versions
+
+    Entries from the previous lock are kept as long as the lock was made
+    for the same base distribution and architecture and the requested
+    packages have not changed. Locked artifacts missing from the cache are
+    downloaded again at exactly their locked versions and must match their
+    locked hashes. When requested packages change, packages that were
+    already locked keep their versions. Offline, nothing is downloaded and
+    anything not locked and cached is an error.
+
+    apt packages can only be resolved on a host running the container's
+    base distribution; elsewhere they are left unlocked with a warning.
+    """
+    arch = host_arch()
+    lock = LockFile(base_distro=config["base_distro"], arch=arch)
+    previous = previous or LockFile()
+    if (previous.base_distro, previous.arch) != (lock.base_distro, lock.arch):
+        if offline and (previous.apt or previous.pip):
+            raise RuntimeError(
+                f"Lock file was made for {previous.base_distro} ({previous.arch}), "
+                f"not {lock.base_distro} ({lock.arch})"
+            )
+        previous = LockFile(files=previous.files)
+    timeout = None if offline else resolve_timeout()
+    on_base_distro = offline or host_distro() == config["base_distro"]
+
+    requested = apt_packages(config)
+    locked = previous.apt.get("packages", {})
+    if previous.apt.get("requested") == requested:
+        missing = {
+            name: entry
+            for name, entry in locked.items()
+            if not cache.get(entry["sha256"], entry["filename"])
+        }
+        if missing and offline:
+            raise RuntimeError(f"{len(missing)} locked apt packages are not cached")
+        if missing and not on_base_distro:
+            raise RuntimeError(
+                f"{len(missing)} locked apt packages are not cached and cannot "
+                f"be downloaded on a {host_distro() or 'non-apt'} host"
+            )
+        if missing:
+            try:
+                download_apt_packages(missing, cache, timeout)
+            except (OSError, subprocess.SubprocessError) as e:
+                raise RuntimeError(
+                    "Could not download locked apt packages "
+                    f"({describe_failure(e)}); {OFFLINE_HINT}"
+                )
+        lock.apt = previous.apt
+    elif offline:
+        raise RuntimeError("apt packages are not locked and cached")
+    elif not on_base_distro:
+        print(
+            f"Warning: Cannot lock apt packages for {config['base_distro']} "
+            f"on a {host_distro() or 'non-apt'} host; they will not be pinned"
+        )
+    else:
+        try:
+            lock.apt = {
+                "requested": requested,
+                "packages": resolve_apt_packages(requested, cache, timeout, locked),
+            }
+        except (OSError, subprocess.SubprocessError) as e:
+            raise RuntimeError(
+                f"Could not resolve apt packages ({describe_failure(e)}); make "
+                f"sure the host package lists are up to date, {OFFLINE_HINT}"
+            )
+
+    python_version = config["python_version"]
+    if (
+        previous.pip.get("requirements") == PIP_PACKAGES
+        and previous.pip.get("python_version") == python_version
+    ):
+        missing = [
+            artifact
+            for artifact in previous.pip.get("artifacts", [])
+            if not cache.get(artifact["sha256"], artifact["filename"])
+        ]
+        if missing and offline:
+            raise RuntimeError(f"{len(missing)} locked Python packages are not cached")
+        if missing:
+            try:
+                download_pip_artifacts(missing, python_version, cache, timeout)
+            except (OSError, subprocess.SubprocessError) as e:
+                raise RuntimeError(
+                    "Could not download locked Python packages "
+                    f"({describe_failure(e)}); {OFFLINE_HINT}"
+                )
+        lock.pip = previous.pip
+    elif offline:
+        raise RuntimeError("Python packages are not locked and cached")
+    else:
+        try:
+            lock.pip = resolve_pip_packages(
+                PIP_PACKAGES, python_version, cache, timeout
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            raise RuntimeError(
+                f"Could not resolve Python packages ({describe_failure(e)}); "
+                f"{OFFLINE_HINT}"
+            )
+
+    for source, destination in config["files"].items():
+        entry = previous.files.get(source)
+        if os.path.isfile(source):
+            sha256 = sha256_file(Path(source))
+            if not cache.get(sha256, Path(source).name):
+                cache.add(Path(source), copy=True)
+            lock.files[source] = {"destination": destination, "sha256": sha256}
+        elif entry and cache.get(entry["sha256"], Path(source).name):
+            lock.files[source] = entry
+        elif offline and not os.path.isdir(source):
+            raise RuntimeError(f"File {source} is missing and not cached")
+
+    return lock
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Log capture for detached ConTiny containers
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+CHUNK_SIZE = 64 * 1024
+FOLLOW_INTERVAL = 0.25
+DEFAULT_TAIL_LINES = 100
+
+
+def rotated_files(path: Path) -> List[Path]:
+    """Return existing log files, newest first"""
+    files = [path] if path.exists() else []
+    index = 1
+    while True:
+        backup = path.with_name(f"{path.name}.{index}")
+        if not backup.exists():
+            break
+        files.append(backup)
+        index += 1
+    return files
+
+
+class RotatingLogWriter:
+    """Append-only log writer that rotates files at a fixed size
+
+    Data is written straight to disk, so memory use does not depend on how
+    much output the container produces. When the log reaches max_bytes it
+    is renamed to ``<name>.1``, older backups are shifted up and anything
+    beyond ``backups`` is discarded.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+    ):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if backups < 0:
+            raise ValueError("backups must not be negative")
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab", buffering=0)
+        self._size = self._file.tell()
+
+    def write(self, data: bytes):
+        """Write data, rotating whenever the current file is full"""
+        while data:
+            room = self.max_bytes - self._size
+            if room <= 0:
+                self.rotate()
+                room = self.max_bytes
+            self._file.write(data[:room])
+            self._size += min(room, len(data))
+            data = data[room:]
+
+    def rotate(self):
+        """Move the current log to a backup and start a new one"""
+        self._file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = self.path.with_name(f"{self.path.name}.{index}")
+                if source.exists():
+                    os.replace(
+                        source, self.path.with_name(f"{self.path.name}.{index + 1}")
+                    )
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        self._file = open(self.path, "wb", buffering=0)
+        self._size = 0
+
+    def close(self):
+        """Close the current log file"""
+        self._file.close()
+
+
+def log_position(path: Path) -> Optional[Tuple[int, int]]:
+    """Return the (inode, size) of the current log file
+
+    A position marks the end of the data already read, so that reading can
+    continue from it later even if the log has been rotated since.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size
+
+
+def position_index(files: List[Path], position: Tuple[int, int]) -> Optional[int]:
+    """Return the index of the log file holding position, if still present"""
+    for index, log_file in enumerate(files):
+        try:
+            if os.stat(log_file).st_ino == position[0]:
+                return index
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def files_until(path: Path, end: Optional[Tuple[int, int]]) -> List[Path]:
+    """Return log files, newest first, starting at the one holding end"""
+    files = rotated_files(path)
+    index = position_index(files, end) if end is not None else None
+    return files if index is None else files[index:]
+
+
+def read_all(path: Path, end: Optional[Tuple[int, int]] = None) -> Iterator[bytes]:
+    """Yield the whole log up to end, oldest data first, in fixed-size chunks"""
+    files = files_until(path, end)
+    for index in range(len(files) - 1, -1, -1):
+        try:
+            with open(files[index], "rb") as f:
+                remaining = None
+                if end is not None and os.fstat(f.fileno()).st_ino == end[0]:
+                    remaining = end[1]
+                while remaining is None or remaining > 0:
+                    size = (
+                        CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                    )
+                    chunk = f.read(size)
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+        except FileNotFoundError:
+            # Rotated away while reading
+            continue
+
+
+def read_tail(path: Path, lines: int, end: Optional[Tuple[int, int]] = None) -> bytes:
+    """Return the last lines of the log up to end
+
+    Files are read backwards in blocks from the end, so only the data
+    needed for the requested lines is read.
+    """
+    if lines <= 0:
+        return b""
+
+    blocks = []
+    newlines = 0
+    for log_file in files_until(path, end):
+        try:
+            with open(log_file, "rb") as f:
+                position = f.seek(0, os.SEEK_END)
+                if end is not None and os.fstat(f.fileno()).st_ino == end[0]:
+                    position = min(position, end[1])
+                while position > 0 and newlines <= lines:
+                    size = min(CHUNK_SIZE, position)
+                    position -= size
+                    f.seek(position)
+                    block = f.read(size)
+                    blocks.append(block)
+                    newlines += block.count(b"\n")
+        except FileNotFoundError:
+            continue
+        if newlines > lines:
+            break
+
+    data = b"".join(reversed(blocks))
+    return b"".join(data.splitlines(keepends=True)[-lines:])
+
+
+def is_running(pid_file: Path) -> bool:
+    """Check whether the supervisor recorded in pid_file is alive
+
+    Zombies and PIDs reused by unrelated processes are not counted when
+    /proc is available.
+    """
+    try:
+        pid = int(pid_file.read_text().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return False
+
+    proc = Path(f"/proc/{pid}")
+    if not Path("/proc/self").exists():
+        return True
+    try:
+        # The state follows the parenthesised command name
+        state = (proc / "stat").read_text().rsplit(")", 1)[1].split()[0]
+        cmdline = (proc / "cmdline").read_bytes()
+    except (OSError, IndexError):
+        return False
+    return state != "Z" and b"continy.supervisor" in cmdline
+
+
+def _copy(f: BinaryIO, output: BinaryIO):
+    """Copy the rest of an open file to output"""
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        output.write(chunk)
+    output.flush()
+
+
+def _open_from(path: Path, inode: int) -> List[BinaryIO]:
+    """Open the log file with inode and every file rotated after it
+
+    Handles are returned oldest first, ending with the current log. All of
+    them are opened before any is read, so they stay valid if the log is
+    rotated again meanwhile. If no file has that inode any more, because it
+    was rotated beyond the last backup, all existing files are opened.
+    """
+    files = rotated_files(path)
+    index = position_index(files, (inode, 0))
+    if index is not None:
+        files = files[: index + 1]
+    handles = []
+    for log_file in reversed(files):
+        try:
+            handles.append(open(log_file, "rb"))
+        except FileNotFoundError:
+            # Rotated away while opening
+            continue
+    return handles
+
+
+def follow(
+    path: Path,
+    output: BinaryIO,
+    pid_file: Optional[Path] = None,
+    start: Optional[Tuple[int, int]] = None,
+):
+    """Write new log data to output as it arrives
+
+    Reading continues from start, a position from log_position(), including
+    anything rotated into backups since; without it only data written from
+    now on is shown. When the log is rotated, the rest of the old file and
+    every backup rotated after it are written before the new file is read,
+    so no output is skipped unless it was already discarded. Stops once the
+    process in pid_file has exited and all of its output has been written.
+    """
+    f = None
+    from_end = start is None
+    if start is not None:
+        handles = _open_from(path, start[0])
+        for handle in handles:
+            if os.fstat(handle.fileno()).st_ino == start[0]:
+                handle.seek(start[1])
+        for handle in handles[:-1]:
+            with handle:
+                _copy(handle, output)
+        f = handles[-1] if handles else None
+
+    try:
+        while True:
+            if f is None:
+                try:
+                    f = open(path, "rb")
+                    if from_end:
+                        f.seek(0, os.SEEK_END)
+                except FileNotFoundError:
+                    f = None
+                from_end = False
+
+            chunk = f.read(CHUNK_SIZE) if f is not None else b""
+            if chunk:
+                output.write(chunk)
+                output.flush()
+                continue
+
+            if f is not None:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    stat = None
+                inode = os.fstat(f.fileno()).st_ino
+                if stat is not None and stat.st_ino != inode:
+                    # Drain the old file, then every backup rotated after it
+                    _copy(f, output)
+                    f.close()
+                    handles = _open_from(path, inode)
+                    if handles and os.fstat(handles[0].fileno()).st_ino == inode:
+                        handles.pop(0).close()
+                    for handle in handles[:-1]:
+                        with handle:
+                            _copy(handle, output)
+                    f = handles[-1] if handles else None
+                    continue
+                if stat is not None and stat.st_size < f.tell():
+                    # Truncated in place when no backups are kept
+                    f.seek(0)
+                    continue
+
+            if pid_file is not None and not is_running(pid_file):
+                if f is not None:
+                    _copy(f, output)
+                break
+            time.sleep(FOLLOW_INTERVAL)
+    finally:
+        if f is not None:
+            f.close()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Background process that runs a detached ConTiny container and captures its
+output into rotating log files
+
+Usage: python -m continy.supervisor [options] LOG_PATH -- COMMAND...
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from .logs import CHUNK_SIZE, DEFAULT_BACKUPS, DEFAULT_MAX_BYTES, RotatingLogWriter
+
+
+def supervise(
+    command: List[str], writer: RotatingLogWriter, cwd: Optional[str] = None
+) -> int:
+    """Run command, copying its stdout and stderr into a rotating log"""
+    try:
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+    except OSError as e:
+        writer.write(f"continy: failed to start {command[0]}: {e}\n".encode())
+        return 127
+
+    fd = process.stdout.fileno()
+    for chunk in iter(lambda: os.read(fd, CHUNK_SIZE), b""):
+        writer.write(chunk)
+    process.stdout.close()
+    return process.wait()
+
+
+def remove_pid_file(pid_file: Path):
+    """Remove the PID file if it still belongs to this process"""
+    try:
+        if int(pid_file.read_text().strip()) == os.getpid():
+            pid_file.unlink()
+    except (OSError, ValueError):
+        pass
+
+
+def daemonize(pid_file: Optional[Path]) -> int:
+    """Fork into a background process detached from the caller
+
+    Returns 0 in the background process, which records its PID before the
+    foreground process gets that PID back. The caller then only waits for
+    a short-lived child instead of having to reap the supervisor itself.
+    """
+    ready_read, ready_write = os.pipe()
+    pid = os.fork()
+    if pid > 0:
+        os.close(ready_write)
+        os.read(ready_read, 1)
+        os.close(ready_read)
+        return pid
+
+    os.close(ready_read)
+    os.setsid()
+    if pid_file is not None:
+        pid_file.write_text(f"{os.getpid()}\n")
+    os.write(ready_write, b"1")
+    os.close(ready_write)
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    return 0
+
+
+def parse_args(argv: List[str]):
+    """Parse supervisor options and the command after --"""
+    parser = argparse.ArgumentParser(prog="python -m continy.supervisor")
+    parser.add_argument("log_path")
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument("--backups", type=int, default=DEFAULT_BACKUPS)
+    parser.add_argument("--cwd")
+    parser.add_argument("--pid-file")
+    parser.add_argument(
+        "--foreground", action="store_true", help="Do not detach from the caller"
+    )
+
+    if "--" not in argv:
+        parser.error("command is required after --")
+    split = argv.index("--")
+    args = parser.parse_args(argv[:split])
+    args.command = argv[split + 1 :]
+    if not args.command:
+        parser.error("command is required after --")
+    if args.max_bytes <= 0:
+        parser.error("--max-bytes must be positive")
+    if args.backups < 0:
+        parser.error("--backups must not be negative")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse arguments and supervise the container command
+
+    Errors found before detaching, such as invalid options or an unwritable
+    log file, are reported on stderr with a non-zero exit status. Otherwise
+    the PID of the background process is printed on stdout.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parse_args(argv)
+    pid_file = Path(args.pid_file) if args.pid_file else None
+
+    try:
+        writer = RotatingLogWriter(Path(args.log_path), args.max_bytes, args.backups)
+    except OSError as e:
+        print(f"Error: Cannot open log file {args.log_path}: {e}", file=sys.stderr)
+        return 1
+
+    if not args.foreground:
+        pid = daemonize(pid_file)
+        if pid > 0:
+            writer.close()
+            # Report the background PID, which may exit before it is read
+            print(pid)
+            return 0
+
+    if args.foreground and pid_file is not None:
+        pid_file.write_text(f"{os.getpid()}\n")
+
+    try:
+        return supervise(args.command, writer, args.cwd)
+    finally:
+        writer.close()
+        if pid_file is not None:
+            remove_pid_file(pid_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
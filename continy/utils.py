@@ -12,18 +12,30 @@ from typing import List, Optional, Dict
 
 
 def run_command(
-    command: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None
+    command: List[str],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
 ) -> subprocess.CompletedProcess:
     """Run a command and return the result"""
     try:
         result = subprocess.run(
-            command, cwd=cwd, env=env, capture_output=True, text=True, check=True
+            command,
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=timeout,
         )
         return result
     except subprocess.CalledProcessError as e:
         print(f"Command failed: {' '.join(command)}")
         print(f"Error: {e.stderr}")
         raise
+    except subprocess.TimeoutExpired:
+        print(f"Command timed out after {timeout}s: {' '.join(command)}")
+        raise
 
 
 def create_directory_structure(base_path: Path, directories: List[str]):
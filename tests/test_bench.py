@@ -0,0 +1,112 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+BENCH_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_continy.py"
+spec = importlib.util.spec_from_file_location("bench_continy", BENCH_PATH)
+bench = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench)
+
+
+def result(min_time, params=None):
+    return {"params": params or {"files": 10}, "min": min_time, "median": min_time}
+
+
+def report(results, profile="quick", schema=None):
+    return {
+        "schema": bench.SCHEMA_VERSION if schema is None else schema,
+        "profile": profile,
+        "results": results,
+    }
+
+
+def test_compare_reports_regressions():
+    baseline = report({"a": result(0.010), "b": result(0.010)})
+    current = report({"a": result(0.020), "b": result(0.011)})
+
+    regressions, skipped, compared = bench.compare_results(baseline, current, 0.25)
+    assert compared == 2
+    assert skipped == []
+    assert len(regressions) == 1
+    assert regressions[0].startswith("a: ")
+
+
+def test_compare_ignores_slowdowns_below_min_delta():
+    baseline = report({"a": result(0.001)})
+    current = report({"a": result(0.002)})
+
+    assert bench.compare_results(baseline, current, 0.25, 0.002)[0] == []
+    assert len(bench.compare_results(baseline, current, 0.25)[0]) == 1
+
+
+def test_compare_lists_skipped_benchmarks():
+    baseline = report(
+        {
+            "changed": result(0.01, {"files": 10}),
+            "zero": result(0.0),
+            "removed": result(0.01),
+        }
+    )
+    current = report(
+        {
+            "changed": result(0.01, {"files": 20}),
+            "zero": result(0.01),
+            "added": result(0.01),
+        }
+    )
+
+    regressions, skipped, compared = bench.compare_results(baseline, current, 0.25)
+    assert (regressions, compared) == ([], 0)
+    assert sorted(reason.split(":")[0] for reason in skipped) == [
+        "added",
+        "changed",
+        "removed",
+        "zero",
+    ]
+
+
+@pytest.fixture
+def run_gate(tmp_path, monkeypatch):
+    def run(baseline, results):
+        monkeypatch.setattr(bench, "run_benchmarks", lambda *args: results)
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps(baseline))
+        return CliRunner().invoke(
+            bench.main, ["--profile", "quick", "--compare", str(path)]
+        )
+
+    return run
+
+
+def test_gate_passes_without_regressions(run_gate):
+    outcome = run_gate(report({"a": result(0.01)}), {"a": result(0.01)})
+    assert outcome.exit_code == 0
+    assert "No performance regressions in 1 benchmarks" in outcome.output
+
+
+def test_gate_fails_on_regression(run_gate):
+    outcome = run_gate(report({"a": result(0.01)}), {"a": result(0.05)})
+    assert outcome.exit_code == 1
+    assert "Performance regressions" in outcome.output
+
+
+@pytest.mark.parametrize(
+    "baseline",
+    [
+        report({"a": result(0.01)}, profile="large"),
+        report({"a": result(0.01)}, schema=0),
+    ],
+)
+def test_gate_fails_on_incompatible_baseline(run_gate, baseline):
+    outcome = run_gate(baseline, {"a": result(0.01)})
+    assert outcome.exit_code == 1
+    assert "not comparable" in outcome.output
+
+
+def test_gate_fails_when_nothing_compared(run_gate):
+    outcome = run_gate(report({"b": result(0.01)}), {"a": result(0.01)})
+    assert outcome.exit_code == 1
+    assert "No benchmarks could be compared" in outcome.output
@@ -0,0 +1,49 @@
+import pytest
+from click.testing import CliRunner
+
+from continy.cli import cli
+
+
+@pytest.mark.parametrize("option", [["--log-max-size", "0"], ["--log-backups", "-1"]])
+def test_run_rejects_invalid_log_limits(tmp_path, monkeypatch, option):
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(cli, ["run", "-n", "demo", "-d"] + option)
+
+    assert result.exit_code == 2
+    assert "Invalid value" in result.output
+
+
+def test_logs_without_logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(cli, ["logs", "demo"])
+
+    assert result.exit_code == 0
+    assert "No logs found" in result.output
+
+
+def test_logs_rejects_negative_tail(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(cli, ["logs", "demo", "--tail", "-1"])
+
+    assert result.exit_code == 2
+
+
+def test_offline_build_without_lock_reports_error(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    CliRunner().invoke(cli, ["create", "-n", "demo"])
+    result = CliRunner().invoke(cli, ["build", "-n", "demo", "--offline"])
+
+    assert result.exit_code == 1
+    assert "Error: Offline build requires a lock file" in result.output
+    assert "Traceback" not in result.output
+
+
+def test_invalid_resolve_timeout_only_affects_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CONTINY_RESOLVE_TIMEOUT", "5m")
+    CliRunner().invoke(cli, ["create", "-n", "demo"])
+
+    assert CliRunner().invoke(cli, ["list"]).exit_code == 0
+    result = CliRunner().invoke(cli, ["build", "-n", "demo"])
+    assert result.exit_code == 1
+    assert "CONTINY_RESOLVE_TIMEOUT must be a positive number" in result.output
@@ -0,0 +1,27 @@
+import pytest
+
+from continy.core import ConTiny
+
+
+@pytest.fixture
+def container(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    container = ConTiny("demo")
+    container.create()
+    container._setup_python_env()
+    return container
+
+
+@pytest.mark.parametrize("limits", [{"max_bytes": 0}, {"backups": -1}])
+def test_detached_run_rejects_invalid_log_limits(container, limits):
+    with pytest.raises(ValueError):
+        container.run(["true"], detach=True, **limits)
+    assert not container.pid_file.exists()
+
+
+def test_detached_run_reports_startup_errors(container, capsys):
+    container.logs_dir.mkdir()
+    container.log_file.mkdir()
+
+    assert container.run(["true"], detach=True) is None
+    assert "Cannot open log file" in capsys.readouterr().out
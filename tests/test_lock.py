@@ -0,0 +1,374 @@
+import hashlib
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from continy import lock as lockmod
+from continy.core import ConTiny
+from continy.lock import (
+    LOCK_VERSION,
+    ArtifactCache,
+    LockFile,
+    lock_dependencies,
+    parse_print_uris,
+)
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class FakeResolver:
+    """Stands in for apt-get and pip, recording each command
+
+    Packages resolve to the current version unless pinned, and the content
+    of every artifact depends on its name and version.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.version = "1.0"
+        self.apt_dependencies = ["libdep"]
+
+    def __call__(self, command, cwd=None, env=None, timeout=None):
+        self.calls.append(command)
+        stdout = ""
+        if command[:2] == ["apt-get", "install"]:
+            specs = [a for a in command[2:] if not a.startswith("-") and "::" not in a]
+            names = [spec.partition("=")[0] for spec in specs]
+            specs += [d for d in self.apt_dependencies if d not in names]
+            for spec in specs:
+                name, _, version = spec.partition("=")
+                version = version or self.version
+                stdout += (
+                    f"'http://deb/{name}_{version}_amd64.deb' "
+                    f"{name}_{version}_amd64.deb 1 "
+                    f"SHA256:{sha256(artifact(name, version))}\n"
+                )
+        elif command[:2] == ["apt-get", "download"]:
+            for spec in command[2:]:
+                if "=" in spec and "::" not in spec:
+                    name, version = spec.split("=")
+                    Path(cwd, f"{name}_{version}_amd64.deb").write_bytes(
+                        artifact(name, version)
+                    )
+        elif "pip" in command:
+            dest = Path(command[command.index("--dest") + 1])
+            if "--no-deps" in command:
+                pins = [a.split("==") for a in command if "==" in a]
+            else:
+                pins = [(name, self.version) for name in ["jupyter", "traitlets"]]
+            for name, version in pins:
+                (dest / f"{name}-{version}-py3-none-any.whl").write_bytes(
+                    artifact(name, version)
+                )
+        elif command[0] == "dpkg":
+            stdout = "amd64\n"
+        return subprocess.CompletedProcess(command, 0, stdout=stdout, stderr="")
+
+    def resolves(self):
+        return [c for c in self.calls if c[0] != "dpkg"]
+
+    def commands(self, *prefix):
+        return [c for c in self.calls if tuple(c[: len(prefix)]) == prefix]
+
+
+def artifact(name, version):
+    return f"{name} {version}".encode()
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    fake = FakeResolver()
+    monkeypatch.setattr(lockmod, "run_command", fake)
+    monkeypatch.setattr(lockmod, "host_distro", lambda: "ubuntu:20.04")
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def config(tmp_path):
+    source = tmp_path / "app.py"
+    source.write_text("print('hi')\n")
+    return {
+        "name": "demo",
+        "base_distro": "ubuntu:20.04",
+        "python_version": "3.9",
+        "packages": ["git"],
+        "files": {str(source): "/workspace/app.py"},
+        "environment": {},
+        "working_dir": "/workspace",
+        "entrypoint": ["/bin/bash"],
+    }
+
+
+def test_lock_file_round_trip(tmp_path):
+    lock = LockFile(
+        base_distro="ubuntu:20.04",
+        arch="amd64",
+        apt={"requested": ["git"], "packages": {}},
+        files={"a": {"destination": "/a", "sha256": "0"}},
+    )
+    path = tmp_path / "continy.lock"
+    lock.save(path)
+
+    assert LockFile.load(path) == lock
+    assert json.loads(path.read_text())["lock_version"] == LOCK_VERSION
+    assert LockFile.load(tmp_path / "missing.lock") is None
+
+
+def test_lock_file_version_mismatch(tmp_path):
+    path = tmp_path / "continy.lock"
+    path.write_text(json.dumps({"lock_version": LOCK_VERSION + 1}))
+
+    with pytest.raises(ValueError):
+        LockFile.load(path)
+
+
+def test_parse_print_uris():
+    output = (
+        "'http://deb/git_1%3a2.25_amd64.deb' git_1%3a2.25_amd64.deb 10 SHA256:abc\n"
+        "'http://deb/curl_7.68_amd64.deb' curl_7.68_amd64.deb 20 MD5Sum:def\n"
+        "Reading package lists...\n"
+    )
+    assert parse_print_uris(output) == {
+        "git": {
+            "version": "1:2.25",
+            "filename": "git_1%3a2.25_amd64.deb",
+            "sha256": "abc",
+        },
+        "curl": {"version": "7.68", "filename": "curl_7.68_amd64.deb"},
+    }
+
+
+def test_resolves_dependency_closure_in_one_download(resolver, cache, config):
+    lock = lock_dependencies(config, None, cache)
+
+    assert lock.base_distro == "ubuntu:20.04"
+    assert lock.arch == "amd64"
+    assert "libdep" in lock.apt["packages"]
+    assert "git" in lock.apt["packages"]
+    assert [c[:2] for c in resolver.resolves()].count(["apt-get", "download"]) == 1
+    assert [a["name"] for a in lock.pip["artifacts"]] == ["jupyter", "traitlets"]
+    assert list(lock.files) == list(config["files"])
+
+
+def test_reuses_locked_artifacts(resolver, cache, config):
+    first = lock_dependencies(config, None, cache)
+    resolver.calls.clear()
+
+    second = lock_dependencies(config, first, cache, offline=True)
+    assert second == first
+    assert resolver.resolves() == []
+
+
+def test_offline_requires_locked_packages(resolver, cache, config):
+    first = lock_dependencies(config, None, cache)
+    config["packages"].append("vim")
+
+    with pytest.raises(RuntimeError, match="apt packages"):
+        lock_dependencies(config, first, cache, offline=True)
+
+
+def test_rejects_corrupted_cache_entry(resolver, cache, config):
+    first = lock_dependencies(config, None, cache)
+    entry = first.apt["packages"]["git"]
+    cache.path(entry["sha256"], entry["filename"]).write_bytes(b"tampered")
+
+    with pytest.raises(RuntimeError):
+        lock_dependencies(config, first, cache, offline=True)
+
+    resolver.calls.clear()
+    lock_dependencies(config, first, cache)
+    assert any(c[:2] == ["apt-get", "download"] for c in resolver.resolves())
+
+
+def test_rejects_download_with_wrong_hash(resolver, cache, config, monkeypatch):
+    original = resolver.__call__
+
+    def tampering(command, cwd=None, env=None, timeout=None):
+        result = original(command, cwd, env, timeout)
+        if command[:2] == ["apt-get", "download"]:
+            Path(cwd, "git_1.0_amd64.deb").write_bytes(b"tampered")
+        return result
+
+    monkeypatch.setattr(lockmod, "run_command", tampering)
+    with pytest.raises(RuntimeError, match="Hash mismatch"):
+        lock_dependencies(config, None, cache)
+
+
+def test_lock_reused_with_empty_cache(resolver, tmp_path, config):
+    first = lock_dependencies(config, None, ArtifactCache(tmp_path / "first"))
+    resolver.version = "2.0"
+    resolver.calls.clear()
+
+    cache = ArtifactCache(tmp_path / "second")
+    second = lock_dependencies(config, first, cache)
+
+    assert second == first
+    assert resolver.commands("apt-get", "install") == []
+    [download] = resolver.commands("apt-get", "download")
+    assert "git=1.0" in download
+    assert "libdep=1.0" in download
+    [pip] = [c for c in resolver.calls if "pip" in c]
+    assert "--no-deps" in pip
+    assert "jupyter==1.0" in pip
+    for entry in second.apt["packages"].values():
+        assert cache.get(entry["sha256"], entry["filename"])
+    for entry in second.pip["artifacts"]:
+        assert cache.get(entry["sha256"], entry["filename"])
+
+
+def test_locked_download_must_match_hash(resolver, tmp_path, config, monkeypatch):
+    first = lock_dependencies(config, None, ArtifactCache(tmp_path / "first"))
+
+    def tampering(command, cwd=None, env=None, timeout=None):
+        result = resolver(command, cwd, env, timeout)
+        if "pip" in command:
+            dest = Path(command[command.index("--dest") + 1])
+            (dest / "jupyter-1.0-py3-none-any.whl").write_bytes(b"tampered")
+        return result
+
+    monkeypatch.setattr(lockmod, "run_command", tampering)
+    with pytest.raises(RuntimeError, match="Hash mismatch"):
+        lock_dependencies(config, first, ArtifactCache(tmp_path / "second"))
+
+
+def test_added_package_keeps_locked_versions(resolver, cache, config):
+    first = lock_dependencies(config, None, cache)
+    resolver.version = "2.0"
+    config["packages"].append("vim")
+
+    second = lock_dependencies(config, first, cache)
+    packages = second.apt["packages"]
+    assert packages["git"] == first.apt["packages"]["git"]
+    assert packages["libdep"] == first.apt["packages"]["libdep"]
+    assert packages["vim"]["version"] == "2.0"
+    assert second.pip == first.pip
+    [download] = resolver.commands("apt-get", "download")[1:]
+    assert download[-1:] == ["vim=2.0"]
+
+
+def test_invalid_resolve_timeout(resolver, cache, config, monkeypatch):
+    monkeypatch.setenv("CONTINY_RESOLVE_TIMEOUT", "5m")
+
+    with pytest.raises(RuntimeError, match="CONTINY_RESOLVE_TIMEOUT"):
+        lock_dependencies(config, None, cache)
+
+
+def test_base_distro_change_invalidates_lock(resolver, cache, config):
+    first = lock_dependencies(config, None, cache)
+    config["base_distro"] = "debian:12"
+
+    with pytest.raises(RuntimeError, match="ubuntu:20.04"):
+        lock_dependencies(config, first, cache, offline=True)
+
+
+def test_arch_change_invalidates_lock(resolver, cache, config, monkeypatch):
+    first = lock_dependencies(config, None, cache)
+    monkeypatch.setattr(lockmod, "host_arch", lambda: "arm64")
+
+    with pytest.raises(RuntimeError, match="amd64"):
+        lock_dependencies(config, first, cache, offline=True)
+
+
+def test_apt_left_unlocked_on_other_distro(resolver, cache, config, capsys):
+    config["base_distro"] = "debian:12"
+    lock = lock_dependencies(config, None, cache)
+
+    assert lock.apt == {}
+    assert "Cannot lock apt packages" in capsys.readouterr().out
+    assert not any(c[0] == "apt-get" for c in resolver.resolves())
+
+
+def test_resolve_failure_suggests_offline(resolver, cache, config, monkeypatch):
+    def failing(command, cwd=None, env=None, timeout=None):
+        if command[0] == "dpkg":
+            return resolver(command)
+        raise subprocess.TimeoutExpired(command, timeout)
+
+    monkeypatch.setattr(lockmod, "run_command", failing)
+    with pytest.raises(RuntimeError, match="--offline"):
+        lock_dependencies(config, None, cache)
+
+
+def test_offline_requires_cached_user_files(resolver, cache, config):
+    first = lock_dependencies(config, None, cache)
+    source = next(iter(config["files"]))
+    Path(source).unlink()
+    entry = first.files[source]
+    cache.path(entry["sha256"], Path(source).name).unlink()
+
+    with pytest.raises(RuntimeError, match="missing and not cached"):
+        lock_dependencies(config, first, cache, offline=True)
+
+
+@pytest.fixture
+def container(tmp_path, monkeypatch, resolver, config):
+    monkeypatch.chdir(tmp_path)
+    container = ConTiny("demo")
+    container.config.update(config)
+    container.create()
+    return container
+
+
+def test_locked_build_installs_closure_without_update(container):
+    container.build()
+    container.build(offline=True)
+
+    script = (container.rootfs_dir / "bootstrap.sh").read_text()
+    assert "apt-get update" not in script
+    assert "/var/cache/continy/apt/libdep_1.0_amd64.deb" in script
+    assert (
+        "python3.9 -m pip install --no-index --find-links /var/cache/continy/pip"
+        in script
+    )
+    staged = container.rootfs_dir / "var/cache/continy/apt"
+    assert (staged / "libdep_1.0_amd64.deb").exists()
+
+
+def test_unlocked_apt_build_updates_package_lists(container, monkeypatch):
+    monkeypatch.setattr(lockmod, "host_distro", lambda: "debian:12")
+    container.build()
+
+    script = (container.rootfs_dir / "bootstrap.sh").read_text()
+    assert "apt-get update" in script
+    assert "apt-get install -y git" in script
+
+
+def test_build_ignores_unsupported_lock_version(container, capsys):
+    container.lock_file.write_text(json.dumps({"lock_version": 1}))
+    with pytest.raises(RuntimeError, match="offline"):
+        container.build(offline=True)
+
+    container.build()
+    assert "Ignoring" in capsys.readouterr().out
+    assert LockFile.load(container.lock_file).apt
+
+
+def test_build_restores_user_file_from_cache(container):
+    container.build()
+    source = next(iter(container.config["files"]))
+    Path(source).unlink()
+
+    container.build(offline=True)
+    assert (container.rootfs_dir / "workspace/app.py").read_text() == "print('hi')\n"
+
+
+def test_build_skips_user_file_missing_from_cache(container, capsys):
+    container.build()
+    source = next(iter(container.config["files"]))
+    Path(source).unlink()
+    lock = LockFile.load(container.lock_file)
+    ArtifactCache().path(lock.files[source]["sha256"], Path(source).name).write_text(
+        "tampered"
+    )
+
+    container.build()
+    assert "Source file not found" in capsys.readouterr().out
@@ -0,0 +1,258 @@
+import io
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from continy import logs
+from continy.logs import (
+    RotatingLogWriter,
+    follow,
+    is_running,
+    log_position,
+    read_all,
+    read_tail,
+    rotated_files,
+)
+from continy.supervisor import main as supervisor_main
+from continy.supervisor import parse_args
+
+
+def write_lines(writer, start, stop):
+    data = b"".join(b"line %d\n" % i for i in range(start, stop))
+    writer.write(data)
+    return data
+
+
+def test_writer_rotates_at_max_bytes(tmp_path):
+    log = tmp_path / "container.log"
+    writer = RotatingLogWriter(log, max_bytes=100, backups=2)
+    data = write_lines(writer, 0, 100)
+    writer.close()
+
+    files = rotated_files(log)
+    assert [f.name for f in files] == [
+        "container.log",
+        "container.log.1",
+        "container.log.2",
+    ]
+    assert all(f.stat().st_size <= 100 for f in files)
+    assert data.endswith(b"".join(read_all(log)))
+
+
+def test_writer_without_backups_truncates(tmp_path):
+    log = tmp_path / "container.log"
+    writer = RotatingLogWriter(log, max_bytes=50, backups=0)
+    write_lines(writer, 0, 100)
+    writer.close()
+
+    assert rotated_files(log) == [log]
+    assert log.stat().st_size <= 50
+
+
+def test_writer_appends_to_existing_log(tmp_path):
+    log = tmp_path / "container.log"
+    log.write_bytes(b"x" * 90)
+    writer = RotatingLogWriter(log, max_bytes=100, backups=1)
+    writer.write(b"y" * 20)
+    writer.close()
+
+    assert (tmp_path / "container.log.1").read_bytes() == b"x" * 90 + b"y" * 10
+    assert log.read_bytes() == b"y" * 10
+
+
+def test_writer_rejects_invalid_limits(tmp_path):
+    with pytest.raises(ValueError):
+        RotatingLogWriter(tmp_path / "a.log", max_bytes=0)
+    with pytest.raises(ValueError):
+        RotatingLogWriter(tmp_path / "a.log", backups=-1)
+
+
+@pytest.mark.parametrize("lines", [1, 5, 40, 1000])
+def test_read_tail_across_rotated_files(tmp_path, lines):
+    log = tmp_path / "container.log"
+    writer = RotatingLogWriter(log, max_bytes=64, backups=20)
+    write_lines(writer, 0, 200)
+    writer.close()
+
+    everything = b"".join(read_all(log))
+    expected = b"".join(everything.splitlines(keepends=True)[-lines:])
+    assert read_tail(log, lines) == expected
+
+
+def test_read_tail_without_trailing_newline(tmp_path):
+    log = tmp_path / "container.log"
+    log.write_bytes(b"one\ntwo\nthree")
+
+    assert read_tail(log, 1) == b"three"
+    assert read_tail(log, 2) == b"two\nthree"
+    assert read_tail(log, 0) == b""
+
+
+def test_read_up_to_position(tmp_path):
+    log = tmp_path / "container.log"
+    writer = RotatingLogWriter(log, max_bytes=64, backups=20)
+    before = write_lines(writer, 0, 20)
+    end = log_position(log)
+    write_lines(writer, 20, 40)
+    writer.close()
+
+    everything = b"".join(read_all(log))
+    shown = everything[: everything.index(b"line 20\n")]
+    assert before.endswith(shown)
+    assert b"".join(read_all(log, end)) == shown
+    assert read_tail(log, 2, end) == b"line 18\nline 19\n"
+
+
+def test_follow_continues_from_position_across_rotation(tmp_path):
+    log = tmp_path / "container.log"
+    writer = RotatingLogWriter(log, max_bytes=64, backups=20)
+    write_lines(writer, 0, 10)
+    start = log_position(log)
+    later = write_lines(writer, 10, 50)
+    writer.close()
+
+    output = io.BytesIO()
+    follow(log, output, pid_file=tmp_path / "missing.pid", start=start)
+    assert output.getvalue() == later
+
+
+def test_follow_picks_up_truncated_log(tmp_path):
+    log = tmp_path / "container.log"
+    log.write_bytes(b"old data that is long\n")
+    start = log_position(log)
+    log.write_bytes(b"new\n")
+
+    output = io.BytesIO()
+    follow(log, output, pid_file=tmp_path / "missing.pid", start=start)
+    assert output.getvalue() == b"new\n"
+
+
+@pytest.mark.parametrize("backups", [3, 50])
+def test_follow_keeps_backups_rotated_between_polls(tmp_path, monkeypatch, backups):
+    log = tmp_path / "container.log"
+    writer = RotatingLogWriter(log, max_bytes=100, backups=backups)
+    bursts = [
+        b"".join(b"burst %d line %02d\n" % (n, i) for i in range(60)) for n in range(4)
+    ]
+    written = []
+
+    def write_burst(interval):
+        # Each burst rotates the log several times before the next poll
+        written.append(bursts[len(written)])
+        writer.write(written[-1])
+
+    monkeypatch.setattr(logs.time, "sleep", write_burst)
+    monkeypatch.setattr(logs, "is_running", lambda pid_file: len(written) < len(bursts))
+
+    output = io.BytesIO()
+    follow(log, output, pid_file=tmp_path / "container.pid")
+    writer.close()
+
+    if backups == 50:
+        assert output.getvalue() == b"".join(bursts)
+    else:
+        # Only data rotated beyond the last backup may be missing
+        assert output.getvalue().startswith(bursts[0][:100])
+        assert output.getvalue().endswith(b"".join(read_all(log)))
+
+
+def test_is_running(tmp_path):
+    pid_file = tmp_path / "container.pid"
+    assert not is_running(pid_file)
+
+    pid_file.write_text("not a pid\n")
+    assert not is_running(pid_file)
+
+    # A live process that is not a supervisor does not count
+    pid_file.write_text(f"{os.getpid()}\n")
+    assert is_running(pid_file) == (not Path("/proc/self").exists())
+
+
+def test_supervisor_requires_command(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        parse_args([str(tmp_path / "a.log"), "--"])
+    with pytest.raises(SystemExit):
+        parse_args([str(tmp_path / "a.log"), "echo"])
+
+
+def test_supervisor_rejects_invalid_limits(tmp_path):
+    log = str(tmp_path / "a.log")
+    with pytest.raises(SystemExit):
+        parse_args([log, "--max-bytes", "0", "--", "true"])
+    with pytest.raises(SystemExit):
+        parse_args([log, "--backups", "-1", "--", "true"])
+
+
+def test_supervisor_parses_command_after_separator(tmp_path):
+    args = parse_args(
+        [str(tmp_path / "a.log"), "--max-bytes", "10", "--", "echo", "--max-bytes"]
+    )
+    assert args.max_bytes == 10
+    assert args.command == ["echo", "--max-bytes"]
+
+
+def test_supervisor_reports_unwritable_log(tmp_path, capsys):
+    assert supervisor_main([str(tmp_path), "--", "true"]) == 1
+    assert "Cannot open log file" in capsys.readouterr().err
+
+
+def test_supervisor_foreground_captures_output(tmp_path):
+    log = tmp_path / "a.log"
+    pid_file = tmp_path / "a.pid"
+    status = supervisor_main(
+        [
+            str(log),
+            "--foreground",
+            "--pid-file",
+            str(pid_file),
+            "--",
+            sys.executable,
+            "-c",
+            "import sys; print('out'); print('err', file=sys.stderr)",
+        ]
+    )
+
+    assert status == 0
+    assert sorted(log.read_bytes().splitlines()) == [b"err", b"out"]
+    assert not pid_file.exists()
+
+
+def test_supervisor_logs_start_failure(tmp_path):
+    log = tmp_path / "a.log"
+    status = supervisor_main([str(log), "--foreground", "--", "/nonexistent/command"])
+
+    assert status == 127
+    assert b"failed to start" in log.read_bytes()
+
+
+def test_supervisor_detaches_and_removes_pid_file(tmp_path):
+    log = tmp_path / "a.log"
+    pid_file = tmp_path / "a.pid"
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "continy.supervisor",
+            str(log),
+            "--pid-file",
+            str(pid_file),
+            "--",
+            "echo",
+            "hi",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0
+    assert int(result.stdout.strip()) > 0
+
+    deadline = time.time() + 10
+    while pid_file.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    assert not pid_file.exists()
+    assert log.read_bytes() == b"hi\n"